@@ -9,8 +9,42 @@ DEFAULT_PATH = '/api/v1/'
 # Базовая директория проекта. Определяется автоматически как путь к текущему файлу.
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Строка подключения к базе данных в формате SQLAlchemy. Используется асинхронный драйвер (aiosqlite, asyncpg).
+# Путь к файлу SQLite строится от BASE_DIR и не зависит от директории, из которой запущено приложение.
+DATABASE_URL = f"sqlite+aiosqlite:///{os.path.join(BASE_DIR, 'db', 'api_tasks.db')}"
+
+# Параметры пула соединений с базой данных.
+# - pool_size: int — количество постоянно открытых соединений в пуле.
+# - max_overflow: int — количество дополнительных соединений сверх pool_size при пиковой нагрузке.
+# - pool_pre_ping: bool — проверять соединение перед выдачей из пула.
+DATABASE_POOL = {
+    'pool_size': 20,
+    'max_overflow': 40,
+    'pool_pre_ping': True,
+}
+
+# Адрес Redis для очереди фоновых задач arq (например, 'redis://localhost:6379/0').
+# Если не задан, обработка отчётов выполняется в процессе приложения через BackgroundTasks.
+REDIS_URL = os.environ.get('REDIS_URL')
+
+# Параметры SQLite, устанавливаемые при открытии каждого соединения (PRAGMA имя = значение).
+# Применяются только при работе с SQLite.
+# - journal_mode: WAL позволяет читать базу параллельно с записью.
+# - synchronous: NORMAL сокращает количество fsync при записи в режиме WAL.
+# - cache_size: размер кэша страниц, отрицательное значение задаётся в килобайтах.
+# - mmap_size: объём файла базы, читаемый через отображение в память, в байтах.
+# - temp_store: MEMORY хранит временные таблицы и индексы в памяти.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -65536,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
 # Словарь с конфигурациями классов валидаторов пароля.
 # Каждый класс валидатора можно настроить с дополнительными параметрами.
+# Ключи — полные пути импорта классов валидаторов (модуль.Класс).
 PASSWORD_VALIDATORS = {
     # Валидатор пароля для проверки сложности:
     # Проверяет наличие заглавных букв, цифр, спецсимволов и т.д.
@@ -19,16 +53,60 @@ PASSWORD_VALIDATORS = {
     # - numbers: int минимальное количество цифр.
     # - special: int минимальное количество спецсимволов.
     # - raise_exception: bool — выбросить исключение при несоответствии требованиям.
-    'tools.password_tools.StrengthPasswordValidator': {},
+    'api.tools.password_tools.StrengthPasswordValidator': {},
 
     # Валидатор пароля для проверки схожести пароля с предыдущими версиями.
     # Параметры:
     # - coefficient: float — коэффициент, определяющий допустимую схожесть.
     # - raise_exception: bool — выбросить исключение при высокой схожести.
-    'tools.password_tools.LevenshteinPasswordValidator': {},
+    'api.tools.password_tools.LevenshteinPasswordValidator': {},
 }
 
 # Алгоритм хэширования для паролей.
-# Этот алгоритм используется для безопасного хранения паролей.
-HASH_PASSWORD_ALGORITHM = 'bcrypt'
+# Этот алгоритм используется для безопасного хранения паролей. Можно указать несколько алгоритмов через запятую:
+# новые хэши создаются первым из них, остальные используются только для проверки ранее сохранённых хэшей,
+# которые пересчитываются первым алгоритмом при успешном входе пользователя.
+HASH_PASSWORD_ALGORITHM = 'argon2,bcrypt'
+
+# Параметры алгоритмов хэширования в формате passlib (<алгоритм>__<параметр>).
+# - argon2__type: str — вариант Argon2, ID (Argon2id) рекомендуется для хранения паролей.
+# - argon2__time_cost: int — количество проходов по памяти.
+# - argon2__memory_cost: int — объём используемой памяти в KiB.
+# - argon2__parallelism: int — количество потоков вычисления одного хэша.
+# - bcrypt__rounds: int — стоимость bcrypt (логарифм количества раундов), каждая единица удваивает время хэширования.
+HASH_PASSWORD_SETTINGS = {
+    'argon2__type': 'ID',
+    'argon2__time_cost': 2,
+    'argon2__memory_cost': 19456,
+    'argon2__parallelism': 1,
+    'bcrypt__rounds': 12,
+}
 # Список доступных алгоритмов хэширования паролей: bcrypt, argon2, pbkdf2_sha256, sha256_crypt
+
+# Целевое время вычисления одного хэша пароля в секундах (например, 0.25).
+# Если задано, при запуске приложения стоимость основного алгоритма (argon2__time_cost или bcrypt__rounds)
+# подбирается под это время на текущем оборудовании и записывается в HASH_PASSWORD_SETTINGS.
+# Стоимость не опускается ниже заданной в HASH_PASSWORD_SETTINGS: если целевое время недостижимо,
+# сохраняется настроенная стоимость и в журнал записывается предупреждение.
+# Хэши, созданные с другой стоимостью, пересчитываются при следующем успешном входе пользователя.
+# Каждый процесс подбирает стоимость самостоятельно, и при нескольких процессах (workers uvicorn/gunicorn)
+# значения могут различаться, из-за чего хэши будут пересчитываться при входах через разные процессы.
+# Поэтому подбор при запуске предназначен для развёртывания в одном процессе. В остальных случаях подобранное
+# значение (выводится в журнал при запуске) следует перенести в HASH_PASSWORD_SETTINGS и оставить здесь None.
+# Если не задано (None), используются значения из HASH_PASSWORD_SETTINGS.
+HASH_PASSWORD_TARGET_TIME = None
+
+# Параметры кэша успешных аутентификаций. Повторные запросы пользователя в течение AUTH_CACHE_TTL секунд
+# не выполняют выборку из базы и проверку хэша пароля.
+# - AUTH_CACHE_SIZE: int — максимальное количество пользователей в кэше.
+# - AUTH_CACHE_TTL: int — время жизни записи кэша в секундах.
+# Кэш хранится в памяти каждого процесса отдельно. При смене пароля запись удаляется только в процессе,
+# обработавшем запрос, поэтому при нескольких процессах (workers uvicorn/gunicorn) старый пароль
+# продолжает приниматься остальными процессами до AUTH_CACHE_TTL секунд. Значение TTL следует выбирать
+# с учётом допустимости такого окна; AUTH_CACHE_TTL = 0 отключает кэш.
+AUTH_CACHE_SIZE = 10_000
+AUTH_CACHE_TTL = 60
+
+# Количество потоков для проверки хэшей паролей. Проверка ресурсоёмкая и выполняется в отдельном ограниченном пуле,
+# чтобы одновременные входы не занимали общий пул потоков приложения.
+PASSWORD_HASH_WORKERS = os.cpu_count() or 1
@@ -1,63 +1,109 @@
+import asyncio
+import hashlib
+import hmac
 import logging
+import os
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
+from cachetools import TTLCache
+from sqlalchemy import select, bindparam, update, delete, insert, Row
 from sqlalchemy.exc import SQLAlchemyError
 
 from api.models.models import UserDB
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from api.tools.password_tools import PasswordHashController
 from api.models.models import Base
+from api.config import AUTH_CACHE_SIZE, AUTH_CACHE_TTL, PASSWORD_HASH_WORKERS
 
 
 logger = logging.getLogger(__name__)
 
+# Кэш успешных аутентификаций: логин -> (отпечаток логина и пароля, учётные данные пользователя)
+_auth_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+_auth_cache_lock = threading.Lock()
+# Случайный ключ процесса для отпечатков, чтобы в памяти не хранились несолёные хэши паролей
+_auth_cache_key = os.urandom(16)
+# Отдельный пул потоков для проверки хэшей паролей, ограничивающий число одновременных проверок
+_password_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password')
+
+# Запрос учётных данных для аутентификации: выбираются только необходимые для проверки поля пользователя
+_select_credentials = select(UserDB.user_id, UserDB.username, UserDB.password).where(
+    UserDB.username == bindparam('username')
+).limit(1)
+
+
+@lru_cache(maxsize=256)
+def _delete_by_key(model_db: Base, key_field):
+    """
+    Собирает запрос удаления записи модели по ключевому полю. Запросы одной формы кэшируются,
+    значение ключа передаётся при выполнении через параметр "key"
+    :param model_db: Модель базы данных
+    :param key_field: Объект ключевого поля у объекта записи
+    :return: Подготовленный запрос
+    """
+    return delete(model_db).where(key_field == bindparam('key')).execution_options(synchronize_session=False)
+
+
+@lru_cache(maxsize=256)
+def _select_owned(model_db: Base, key_field, user_field):
+    """
+    Собирает запрос выборки записи модели по ключевому полю в пределах записей пользователя.
+    Запросы одной формы кэшируются, значения передаются при выполнении через параметры "key" и "user_id"
+    :param model_db: Модель базы данных
+    :param key_field: Объект ключевого поля у объекта записи
+    :param user_field: Объект поля идентификатора владельца у объекта записи
+    :return: Подготовленный запрос
+    """
+    return select(model_db).where(key_field == bindparam('key'), user_field == bindparam('user_id')).limit(1)
+
+
+@lru_cache(maxsize=256)
+def _column_names(model_db: Base) -> frozenset:
+    """
+    Возвращает имена колонок таблицы модели. Результат кэшируется для каждого класса модели
+    :param model_db: Модель базы данных
+    :return: Множество имён колонок
+    """
+    return frozenset(model_db.__table__.columns.keys())
+
 
 class Manager:
     """
     Менеджер для запросов к базе
     """
     def __init__(self, session):
-        self.session: Session = session  # сессия для работы с БД
+        self.session: AsyncSession = session  # сессия для работы с БД. Закрывается владельцем сессии, а не менеджером
 
-    def close(self):
-        """
-        Закрываем подключение к сессии
-        """
-        self.session.close()
-
-    def __del__(self):
-        """
-        Закрываем сессию
-        """
-        self.close()
-
-    def _field_update(self, obj, data: dict):
+    async def _field_update(self, obj, data: dict):
         """
         Выполняет обновление полей объекта на основе полученных данных
         :param obj: Объект записи из db для обновления
         :param data: Данные для обновления
         :return: Обновленный объект
         """
-        for field, value in data.items():
-            if hasattr(obj, field):
-                setattr(obj, field, value)
-        self._execute_query(obj)
+        fields = data.keys() & _column_names(type(obj)) if data else None
+        if not fields:
+            return obj
+        for field in fields:
+            setattr(obj, field, data[field])
+        await self._commit()
         return obj
 
-    def _execute_query(self, obj: Base):
+    async def _commit(self):
         """
-        Функция для непосредственного сохранения изменений объекта в базе
-        :param obj: Объект для сохранения
+        Функция для непосредственного сохранения изменений в базе
         """
         try:
-            self.session.commit()
-            self.session.refresh(obj)
+            await self.session.commit()
         except SQLAlchemyError as error:
-            logger.critical(f"Во время запроса к DB произошла критическая ошибка: {error}")
-            self.session.rollback()
+            logger.critical("Во время запроса к DB произошла критическая ошибка: %s", error)
+            await self.session.rollback()
             raise error
 
-    def create(self, model_db: Base, data: dict) -> Base:
+    async def create(self, model_db: Base, data: dict) -> Base:
         """
         Создание новой записи в таблице.
 
@@ -67,12 +113,28 @@ class Manager:
         """
         instance = model_db(**data)
         self.session.add(instance)
-        self._execute_query(instance)
+        await self._commit()
         return instance
 
-    def update(self, model_db:Base, key: uuid.UUID | str, key_field, data: dict):
+    async def create_many(self, model_db: Base, rows: list[dict]) -> list:
+        """
+        Создание нескольких записей в таблице пакетным INSERT в одной транзакции.
+        :param model_db: Модель базы данных
+        :param rows: Список словарей с данными для создания записей
+        :return: Список первичных ключей созданных записей в порядке rows
+        """
+        if not rows:
+            return []
+        statement = insert(model_db).returning(
+            *model_db.__table__.primary_key.columns, sort_by_parameter_order=True
+        )
+        keys = (await self.session.execute(statement, rows)).scalars().all()
+        await self._commit()
+        return keys
+
+    async def update(self, model_db:Base, key: uuid.UUID | str, key_field, data: dict):
         """
-        Обновление существующей записи в таблице.
+        Обновление существующей записи в таблице одним запросом UPDATE ... RETURNING.
         :param model_db: Модель базы данных
         :param key: UUID записи для обновления
         :param key_field: Объект ключевого поля у объекта записи
@@ -83,67 +145,128 @@ class Manager:
             try:
                 key = uuid.UUID(key)
             except Exception as error:
-                logger.error(f"Не удалось преобразовать ключ объекта {key} к UUID: {error}")
+                logger.error("Не удалось преобразовать ключ объекта %s к UUID: %s", key, error)
                 return None
-        instance = self.session.query(model_db).filter(key_field == key).first()
-        if not instance:
-            return None
-        self._field_update(instance, data)
+        statement = update(model_db).where(key_field == key).values(**data).returning(model_db)
+        instance = (await self.session.execute(statement)).scalar_one_or_none()
+        await self._commit()
         return instance
 
-    def save(self, obj: Base, data: dict):
+    async def update_where(self, model_db: Base, filters: list, data: dict) -> int:
+        """
+        Обновление записей, подходящих под условия фильтрации, одним запросом UPDATE ... WHERE без предварительной выборки.
+        :param model_db: Модель базы данных
+        :param filters: Список условий для фильтрации, передается как список выражений (например, [model_db.column == value])
+        :param data: Данные для обновления
+        :return: Количество обновлённых записей
+        """
+        statement = update(model_db).where(*filters).values(**data).execution_options(synchronize_session=False)
+        result = await self.session.execute(statement)
+        await self._commit()
+        return result.rowcount
+
+    async def save(self, obj: Base, data: dict):
         """
         Обновляет поля объекта на основе данных из data
         :param obj: Объект для обновления
         :param data: Данные для обновления
         :return:
         """
-        return self._field_update(obj, data)
+        return await self._field_update(obj, data)
 
-    def delete(self, model_db, key: uuid.UUID, key_field) -> bool:
+    async def delete(self, model_db, key: uuid.UUID, key_field) -> bool:
         """
-        Удаление записи из базы данных.
+        Удаление записи из базы данных одним запросом DELETE.
 
         :param model_db: Модель базы данных
         :param key: UUID записи для удаления
         :param key_field: Объект ключевого поля у объекта записи
         :return: True, если запись удалена, иначе False
         """
-        instance = self.session.query(model_db).filter(key_field == key).first()
-        if not instance:
-            return False
-        self.session.delete(instance)
-        self._execute_query(instance) # Применяем изменения в БД
-        return True
+        result = await self.session.execute(_delete_by_key(model_db, key_field), {'key': key})
+        await self._commit()  # Применяем изменения в БД
+        return result.rowcount > 0
+
+    async def delete_where(self, model_db: Base, filters: list) -> int:
+        """
+        Удаление записей, подходящих под условия фильтрации, одним запросом DELETE ... WHERE без предварительной выборки.
+        :param model_db: Модель базы данных
+        :param filters: Список условий для фильтрации, передается как список выражений (например, [model_db.column == value])
+        :return: Количество удалённых записей
+        """
+        statement = delete(model_db).where(*filters).execution_options(synchronize_session=False)
+        result = await self.session.execute(statement)
+        await self._commit()
+        return result.rowcount
 
-    def all(self, model_db: Base):
+    async def all(self, model_db: Base):
         """
         Получение всех записей для указанной модели.
 
         :param model_db: Модель базы данных
         :return: Список всех объектов модели
         """
-        return self.session.query(model_db).all()
+        return (await self.session.execute(select(model_db))).scalars().all()
 
-    def filter(self, model_db: Base, filters: list = None):
+    async def filter(self, model_db: Base, filters: list = None, options: list = None):
         """
         Получение записей с применением условий фильтрации.
 
         :param model_db: Модель базы данных
         :param filters: Список условий для фильтрации, передается как список выражений (например, [model_db.column == value])
+        :param options: Список опций загрузки связей (например, [selectinload(model_db.relation)])
         :return: Отфильтрованные объекты модели
         """
-        result = self.session.query(model_db)
-        return result.all() if not filters else result.filter(*filters).all()
+        statement = select(model_db)
+        if filters:
+            statement = statement.where(*filters)
+        if options:
+            statement = statement.options(*options)
+        return (await self.session.execute(statement)).scalars().all()
 
-    def get(self, model_db: Base, filters: list = None):
+    async def stream(self, model_db: Base, filters: list = None, batch_size: int = 100):
         """
-        Получение одной записи с применением условий фильтрации.
+        Построчное получение записей с применением условий фильтрации. Записи выбираются из базы партиями
+        по batch_size строк, без загрузки всего результата в память.
         :param model_db: Модель базы данных
         :param filters: Список условий для фильтрации, передается как список выражений (например, [model_db.column == value])
-        :return: Объект записи
+        :param batch_size: Количество строк в одной партии выборки
+        :return: Асинхронный генератор объектов модели
         """
-        return self.filter(model_db, filters)[0]
+        statement = select(model_db)
+        if filters:
+            statement = statement.where(*filters)
+        result = await self.session.stream_scalars(statement.execution_options(yield_per=batch_size))
+        async for instance in result:
+            yield instance
+
+    async def get(self, model_db: Base, filters: list = None, options: list = None):
+        """
+        Получение одной записи с применением условий фильтрации. Выборка ограничивается одной строкой на стороне базы.
+        :param model_db: Модель базы данных
+        :param filters: Список условий для фильтрации, передается как список выражений (например, [model_db.column == value])
+        :param options: Список опций загрузки связей (например, [selectinload(model_db.relation)])
+        :return: Объект записи или None, если запись не найдена
+        """
+        statement = select(model_db)
+        if filters:
+            statement = statement.where(*filters)
+        if options:
+            statement = statement.options(*options)
+        return (await self.session.execute(statement.limit(1))).scalar_one_or_none()
+
+    async def get_owned(self, model_db: Base, key_field, user_field, key: uuid.UUID, user_id: uuid.UUID):
+        """
+        Получение одной записи пользователя по её ключу.
+        :param model_db: Модель базы данных
+        :param key_field: Объект ключевого поля у объекта записи
+        :param user_field: Объект поля идентификатора владельца у объекта записи
+        :param key: UUID записи
+        :param user_id: UUID владельца записи
+        :return: Объект записи или None, если запись не найдена
+        """
+        statement = _select_owned(model_db, key_field, user_field)
+        return (await self.session.execute(statement, {'key': key, 'user_id': user_id})).scalar_one_or_none()
 
 
 class UserManager(Manager):
@@ -151,27 +274,61 @@ class UserManager(Manager):
     Специальный менеджер для модели пользователя
     """
     user = UserDB
-    def get_user(self, username: str) -> UserDB | None:
+    async def get_user(self, username: str) -> Row | None:
         """
-        Получает запись пользователя из базы
+        Получает учётные данные пользователя из базы
         :param username: Логин пользователя
-        :return: Объект записи пользователя или none
+        :return: Строка с полями user_id, username, password или none
         """
-        user = self.filter(self.user, [self.user.username == username])
-        return user[0] if user else None
+        return (await self.session.execute(_select_credentials, {'username': username})).first()
 
-    def authenticate(self, username: str, password: str) -> UserDB | bool:
+    async def authenticate(self, username: str, password: str) -> Row | bool:
         """
         Функция аутентификации пользователя на основе его логина и пароля
-        Сначала проверяется наличие пользователя с таким логином в базе. В случае наличия проверяется пароль
+        Сначала проверяется кэш успешных аутентификаций. При промахе проверяется наличие пользователя
+        с таким логином в базе. В случае наличия проверяется пароль
         :param username: Логин пользователя
         :param password: Незахешированный пароль пользователя
-        :return: Запись пользователя из базы или False как сигнал, что аутентификация не пройдена
+        :return: Учётные данные пользователя из базы или False как сигнал, что аутентификация не пройдена
         """
-        user = self.get_user(username)
+        digest = hashlib.blake2b(f'{username}:{password}'.encode(), key=_auth_cache_key, digest_size=16).digest()
+        with _auth_cache_lock:
+            cached = _auth_cache.get(username)
+        if cached is not None and hmac.compare_digest(cached[0], digest):
+            return cached[1]
+        user = await self.get_user(username)
         if user is None:
             return False
         controller  = PasswordHashController()
-        authenticate = controller.check_password(password, user.password)
-        return user if authenticate else False
+        # Проверка хэша пароля ресурсоёмкая, поэтому выполняется в отдельном пуле потоков, не блокируя цикл событий
+        authenticate = await asyncio.get_running_loop().run_in_executor(
+            _password_pool, controller.check_password, password, user.password
+        )
+        if not authenticate:
+            return False
+        if controller.needs_update(user.password):
+            # Хеш устаревшего алгоритма пересчитывается при входе, пока известен исходный пароль
+            await self.update(UserDB, user.user_id, UserDB.user_id, {'password': await self.hash_password(password)})
+        with _auth_cache_lock:
+            _auth_cache[username] = (digest, user)
+        return user
+
+    @staticmethod
+    async def hash_password(password: str) -> str:
+        """
+        Хэширует пароль в отдельном пуле потоков, не блокируя цикл событий
+        :param password: Незахешированный пароль пользователя
+        :return: Хэш пароля
+        """
+        controller = PasswordHashController()
+        return await asyncio.get_running_loop().run_in_executor(_password_pool, controller.hash_password, password)
+
+    @staticmethod
+    def forget(username: str):
+        """
+        Удаляет пользователя из кэша аутентификаций. Вызывается при изменении данных пользователя
+        :param username: Логин пользователя
+        """
+        with _auth_cache_lock:
+            _auth_cache.pop(username, None)
 
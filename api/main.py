@@ -1,29 +1,90 @@
-import datetime
 import logging
-import random
 import uuid
-from time import sleep
+from contextlib import asynccontextmanager
 
+import orjson
 import uvicorn
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks
+from arq import create_pool
+from arq.connections import RedisSettings
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from sqlalchemy import Row
+from sqlalchemy.exc import SQLAlchemyError
 from starlette import status
-from starlette.responses import JSONResponse, Response
+from starlette.responses import Response
 
-from api.config import DEFAULT_PATH, DEBUG
+from api.config import DEFAULT_PATH, DEBUG, REDIS_URL, HASH_PASSWORD_TARGET_TIME
 from api.db.manager import Manager, UserManager
-from api.models.models import TaskRequiredInput, TaskInput, TaskCreate, BaseUser, UserRequest, UserDB, TaskDB, Base, \
-    ReportCreate, ReportDB, ReportStatus, Session
-from api.tools.api_tools import ApiSerializers
+from api.models.models import TaskRequiredInput, TaskInput, TaskCreate, TaskOut, BaseUser, UserRequest, UserOut, UserDB, TaskDB, \
+    ReportCreate, ReportDB, Session, engine, init_models
+from api.tools.api_tools import serialize_task, items_attr, accepts_media_type
+from api.tools.password_tools import calibrate_hash_cost
+from api.workers import simulation_long_process
 
 
 logger = logging.getLogger(__name__)
 security = HTTPBasic()
-app = FastAPI()
-serializer_tool = ApiSerializers()
 
 
-def authenticate(credentials: HTTPBasicCredentials = Depends(security)) -> Base:
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Подготавливает базу данных и подключение к очереди задач при запуске приложения,
+    закрывает соединения при остановке. Если задано HASH_PASSWORD_TARGET_TIME,
+    подбирает стоимость хеширования паролей под текущее оборудование
+    """
+    await init_models()
+    if HASH_PASSWORD_TARGET_TIME:
+        cost = calibrate_hash_cost(HASH_PASSWORD_TARGET_TIME)
+        logger.info(
+            'Стоимость хеширования паролей подобрана под %s с: %s. При нескольких процессах приложения '
+            'закрепите это значение в HASH_PASSWORD_SETTINGS', HASH_PASSWORD_TARGET_TIME, cost
+        )
+    app.state.arq = await create_pool(RedisSettings.from_dsn(REDIS_URL)) if REDIS_URL else None
+    yield
+    if app.state.arq is not None:
+        await app.state.arq.close()
+    await engine.dispose()
+
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+# Сжатие ответов: короткие ответы отдаются без сжатия, списки задач сжимаются
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=5)
+# Тип ответа для построчной (ndjson) выдачи списков, запрашивается клиентом через заголовок Accept
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+async def get_session():
+    """
+    :return: Сессия db, общая для всех зависимостей одного запроса
+    """
+    async with Session() as session:
+        try:
+            yield session
+        except SQLAlchemyError as error:
+            logger.critical('Проблемы во время работы с базой %s', error)
+            raise error
+
+
+async def get_manager(session=Depends(get_session)) -> Manager:
+    """
+    :return: Объект подключения к db
+    """
+    return Manager(session)
+
+
+async def get_user_manager(session=Depends(get_session)) -> UserManager:
+    """
+    :return: Объект подключения к db для работы с пользователями
+    """
+    return UserManager(session)
+
+
+async def authenticate(
+        credentials: HTTPBasicCredentials = Depends(security), user_manager=Depends(get_user_manager)
+) -> Row:
     """
     Проверка аутентификации пользователя с использованием базовой аутентификации (HTTP Basic Authentication).
     Эта функция извлекает учетные данные (имя пользователя и пароль) из запроса, выполняет проверку
@@ -33,14 +94,13 @@ def authenticate(credentials: HTTPBasicCredentials = Depends(security)) -> Base:
     - Имя пользователя и пароль должны быть переданы через HTTP заголовок `Authorization` в формате Basic Auth.
     - Пароль должен быть правильно сопоставлен с сохраненным значением в базе данных.
     **Возвращаемое значение:**
-    - Если аутентификация успешна, возвращается объект модели пользователя
+    - Если аутентификация успешна, возвращается строка с полями user_id, username и password пользователя
     """
     username = credentials.username
     password = credentials.password
-    user_manager = UserManager(Session())
-    user = user_manager.authenticate(username, password)
+    user = await user_manager.authenticate(username, password)
     if not user:
-        logger.warning(f"Неудачная попытка входа пользователем {username}. {datetime.datetime.now()}")
+        logger.warning("Неудачная попытка входа пользователем %s", username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
@@ -49,87 +109,114 @@ def authenticate(credentials: HTTPBasicCredentials = Depends(security)) -> Base:
     return user
 
 
-def get_manager():
-    """
-    :return: Объект подключения к db
-    """
-    db_manager = Manager(Session())
-    try:
-        yield db_manager
-    except Exception as error:
-        logger.critical(f'Проблемы во время работы с базой {error}')
-    finally:
-        db_manager.close()
-
-
 # ------------------------------ Эндпоинты взаимодействия с задачами ---------------------------------------------------
-@app.get(DEFAULT_PATH + 'tasks/{task_id}')
-async def get_task(task_id: str, current_user=Depends(authenticate), manager=Depends(get_manager)):
+@app.get(DEFAULT_PATH + 'tasks/{task_id}', response_model=TaskOut)
+async def get_task(task_id: uuid.UUID, current_user=Depends(authenticate), manager=Depends(get_manager)):
     """
     Функция для возврата данных одной задачи
     :param task_id: Идентификатор задачи
     :param current_user: Объект записи текущего аутентифицированного пользователя из DB
     :param manager: Объект подключения к db
-    :return: Данные в виде словаря о запрошенной задаче
+    :return: Объект запрошенной задачи, сериализуемый по модели TaskOut
     """
     try:
-        task = manager.get(TaskDB, [
-            TaskDB.task_id == uuid.UUID(task_id), TaskDB.user_id == current_user.user_id
-        ])
+        task = await manager.get_owned(TaskDB, TaskDB.task_id, TaskDB.user_id, task_id, current_user.user_id)
         if not task:
             return Response(status_code=status.HTTP_404_NOT_FOUND)
-        task = serializer_tool.serialize_task(task)
     except Exception as error:
         logger.error(
-            f'Во время работы "get_task" произошла ошибка: {error}. Данные запроса {task_id}, {current_user.user_id}'
+            'Во время работы "get_task" произошла ошибка: %s. Данные запроса %s, %s',
+            error, task_id, current_user.user_id
         )
-        return JSONResponse({'error': str(error)} if DEBUG else {}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    return JSONResponse(task, status_code=status.HTTP_200_OK)
+        return ORJSONResponse({'error': str(error)} if DEBUG else {}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return task
+
+
+async def stream_tasks(user_id: uuid.UUID):
+    """
+    Построчно сериализует задачи пользователя в формат ndjson. Использует собственную сессию db,
+    так как тело потокового ответа отправляется уже после закрытия сессии запроса
+    :param user_id: Идентификатор пользователя
+    :return: Асинхронный генератор строк ndjson
+    """
+    try:
+        async with Session() as session:
+            async for task in Manager(session).stream(TaskDB, [TaskDB.user_id == user_id]):
+                yield orjson.dumps(serialize_task(task)) + b'\n'
+    except Exception as error:
+        # Ошибка пробрасывается дальше, чтобы сервер прервал ответ и клиент не принял обрезанный список за полный
+        logger.error('Во время потоковой выдачи задач произошла ошибка: %s. Данные запроса: %s', error, user_id)
+        raise error
+
+
+async def prepend_line(first_line: bytes, lines):
+    """
+    Возвращает уже полученную первую строку потока, затем остальные строки
+    :param first_line: Первая строка потока
+    :param lines: Асинхронный генератор оставшихся строк
+    :return: Асинхронный генератор строк
+    """
+    yield first_line
+    async for line in lines:
+        yield line
 
 
-@app.get(f'{DEFAULT_PATH}tasks/')
-async def get_tasks(current_user=Depends(authenticate), manager=Depends(get_manager)):
+@app.get(f'{DEFAULT_PATH}tasks/', response_model=list[TaskOut])
+async def get_tasks(request: Request, current_user=Depends(authenticate), manager=Depends(get_manager)):
     """
-    Возвращает все задачи пользователя
+    Возвращает все задачи пользователя. Если клиент принимает application/x-ndjson, задачи выдаются потоком,
+    по одной в строке, без буферизации всего списка. Первая задача потока читается до отправки ответа,
+    поэтому при отсутствии задач или ошибке базы ответ такой же, как у JSON-списка (404 или 500)
+    :param request: Объект запроса
     :param current_user: Объект записи текущего аутентифицированного пользователя из DB
     :param manager: Объект подключения к db
-    :return: Словарь всех задач пользователя
+    :return: Список задач пользователя, сериализуемых по модели TaskOut
     """
     try:
-        tasks = manager.filter(TaskDB , [TaskDB.user_id == current_user.user_id])
+        if accepts_media_type(request.headers.get('accept', ''), NDJSON_MEDIA_TYPE):
+            lines = stream_tasks(current_user.user_id)
+            first_line = await anext(lines, None)
+            if first_line is None:
+                return Response(status_code=status.HTTP_404_NOT_FOUND)
+            return StreamingResponse(prepend_line(first_line, lines), media_type=NDJSON_MEDIA_TYPE)
+        tasks = await manager.filter(TaskDB , [TaskDB.user_id == current_user.user_id])
         if not tasks:
             return Response(status_code=status.HTTP_404_NOT_FOUND)
-        tasks = serializer_tool.serialize_tasks(tasks)
     except Exception as error:
         logger.error(
-            f'Во время работы "get_tasks" произошла ошибка: {error}. Данные запроса: {current_user.user_id}'
+            'Во время работы "get_tasks" произошла ошибка: %s. Данные запроса: %s', error, current_user.user_id
         )
-        return JSONResponse({'error': str(error)} if DEBUG else {}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    return JSONResponse(tasks, status_code=status.HTTP_200_OK)
+        return ORJSONResponse({'error': str(error)} if DEBUG else {}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return tasks
 
 
 @app.delete(DEFAULT_PATH + 'tasks/{task_id}')
-async def delete_tasks(task_id: str, current_user=Depends(authenticate), manager=Depends(get_manager)):
+async def delete_tasks(task_id: uuid.UUID, current_user=Depends(authenticate), manager=Depends(get_manager)):
     """
     Функция для удаления задачи по её идентификатору
     :param task_id: Идентификатор задачи
     :param current_user: Объект записи текущего аутентифицированного пользователя из DB
     :param manager: Объект подключения к db
-    :return: Ответ 204 в случае успеха удаления
+    :return: Ответ 204 в случае успеха удаления или 404, если у пользователя нет такой задачи
     """
     try:
-        manager.delete(TaskDB, uuid.UUID(task_id), TaskDB.task_id)
+        deleted = await manager.delete_where(TaskDB, [
+            TaskDB.task_id == task_id, TaskDB.user_id == current_user.user_id
+        ])
+        if not deleted:
+            return Response(status_code=status.HTTP_404_NOT_FOUND)
     except Exception as error:
         logger.error(
-            f'Во время работы "delete_tasks" произошла ошибка: {error}. Данные запроса: {task_id} {current_user.user_id}'
+            'Во время работы "delete_tasks" произошла ошибка: %s. Данные запроса: %s %s',
+            error, task_id, current_user.user_id
         )
-        return JSONResponse({'error': str(error)} if DEBUG else {}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return ORJSONResponse({'error': str(error)} if DEBUG else {}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
 @app.put(DEFAULT_PATH + 'tasks/{task_id}')
 async def full_update_task(
-        task_id: str, task: TaskRequiredInput, current_user=Depends(authenticate), manager=Depends(get_manager)
+        task_id: uuid.UUID, task: TaskRequiredInput, current_user=Depends(authenticate), manager=Depends(get_manager)
 ):
     """
     Функция для полноформатного обновления данных задачи. Поле expired будет занесено в базу на основе логики валидации
@@ -140,24 +227,25 @@ async def full_update_task(
     :return:
     """
     try:
-        db_task = manager.get(TaskDB, [
-            TaskDB.task_id == uuid.UUID(task_id), TaskDB.user_id == current_user.user_id
-        ])
-        if not db_task:
+        data = items_attr(task.model_fields_set, task)
+        updated = await manager.update_where(TaskDB, [
+            TaskDB.task_id == task_id, TaskDB.user_id == current_user.user_id
+        ], data)
+        if not updated:
             return Response(status_code=status.HTTP_404_NOT_FOUND)
-        data = serializer_tool.items_attr(task.model_fields_set, task)
-        manager.save(db_task, data)
     except Exception as error:
         logger.error(
-            f'Во время работы "full_update_task" произошла ошибка: {error}. '
-            f'Данные запроса: {task_id} {current_user.user_id}'
+            'Во время работы "full_update_task" произошла ошибка: %s. Данные запроса: %s %s',
+            error, task_id, current_user.user_id
         )
-        return JSONResponse({'error': str(error)} if DEBUG else {}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    return JSONResponse(serializer_tool.items_str(data), status_code=status.HTTP_200_OK)
+        return ORJSONResponse({'error': str(error)} if DEBUG else {}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return ORJSONResponse(data, status_code=status.HTTP_200_OK)
 
 
 @app.patch(DEFAULT_PATH + 'tasks/{task_id}')
-async def update_task(task_id: str, task: TaskInput, current_user=Depends(authenticate), manager=Depends(get_manager)):
+async def update_task(
+        task_id: uuid.UUID, task: TaskInput, current_user=Depends(authenticate), manager=Depends(get_manager)
+):
     """
     Функция для частичного обновления данных задачи. Требует stop_date
     :param task_id: Идентификатор задачи для обновления
@@ -167,19 +255,19 @@ async def update_task(task_id: str, task: TaskInput, current_user=Depends(authen
     :return:
     """
     try:
-        db_task = manager.get(TaskDB, [
-            TaskDB.task_id == uuid.UUID(task_id), TaskDB.user_id == current_user.user_id
-        ])
-        if not db_task:
+        data = items_attr(task.model_fields_set, task) | {"user_id": current_user.user_id}
+        updated = await manager.update_where(TaskDB, [
+            TaskDB.task_id == task_id, TaskDB.user_id == current_user.user_id
+        ], data)
+        if not updated:
             return Response(status_code=status.HTTP_404_NOT_FOUND)
-        data = serializer_tool.items_attr(task.model_fields_set, task) | {"user_id": current_user.user_id}
-        manager.save(db_task, data)
     except Exception as error:
         logger.error(
-            f'Во время работы "update_task" произошла ошибка: {error}. Данные запроса: {task_id} {current_user.user_id}'
+            'Во время работы "update_task" произошла ошибка: %s. Данные запроса: %s %s',
+            error, task_id, current_user.user_id
         )
-        return JSONResponse({'error': str(error)} if DEBUG else {}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    return JSONResponse(serializer_tool.items_str(data), status_code=status.HTTP_200_OK)
+        return ORJSONResponse({'error': str(error)} if DEBUG else {}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return ORJSONResponse(data, status_code=status.HTTP_200_OK)
 
 
 @app.post(f"{DEFAULT_PATH}tasks/")
@@ -192,35 +280,57 @@ async def create_task(task: TaskCreate, current_user=Depends(authenticate), mana
     :return: Словарь с данными о созданной задаче
     """
     try:
-        data = serializer_tool.items_attr(task.model_fields_set, task) | {"user_id": current_user.user_id}
-        task = manager.create(TaskDB, data)
-        data = serializer_tool.items_str(data) | {'task_id' : str(task.task_id)}
+        data = items_attr(task.model_fields_set, task) | {"user_id": current_user.user_id}
+        task = await manager.create(TaskDB, data)
+        data['task_id'] = task.task_id
+    except Exception as error:
+        logger.error(
+            'Во время работы "create_task" произошла ошибка: %s. Данные запроса: %s', error, current_user.user_id
+        )
+        return ORJSONResponse({'error': str(error)} if DEBUG else {}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return ORJSONResponse(data, status_code=status.HTTP_201_CREATED)
+
+
+@app.post(f"{DEFAULT_PATH}tasks/bulk")
+async def create_tasks(tasks: list[TaskCreate], current_user=Depends(authenticate), manager=Depends(get_manager)):
+    """
+    Функция для пакетного создания задач одним запросом к db
+    :param tasks: Список объектов задач с входными данными
+    :param current_user: Объект записи текущего аутентифицированного пользователя из DB
+    :param manager: Объект подключения к db
+    :return: Список словарей с данными о созданных задачах
+    """
+    try:
+        rows = [
+            items_attr(task.model_fields_set, task) | {"user_id": current_user.user_id} for task in tasks
+        ]
+        task_ids = await manager.create_many(TaskDB, rows)
+        response_data = [data | {'task_id': task_id} for data, task_id in zip(rows, task_ids)]
     except Exception as error:
         logger.error(
-            f'Во время работы "create_task" произошла ошибка: {error}. Данные запроса: {current_user.user_id}'
+            'Во время работы "create_tasks" произошла ошибка: %s. Данные запроса: %s', error, current_user.user_id
         )
-        return JSONResponse({'error': str(error)} if DEBUG else {}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    return JSONResponse(data, status_code=status.HTTP_201_CREATED)
+        return ORJSONResponse({'error': str(error)} if DEBUG else {}, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return ORJSONResponse(response_data, status_code=status.HTTP_201_CREATED)
 
 
 # ------------------------------ Эндпоинты взаимодействия с пользователями ---------------------------------------------
-@app.get(f'{DEFAULT_PATH}users/')
-async def get_user(current_user=Depends(authenticate)):
+@app.get(f'{DEFAULT_PATH}users/', response_model=UserOut, response_model_exclude_none=True)
+async def get_user(current_user=Depends(authenticate), manager=Depends(get_manager)):
     """
     Функция для получения данных пользователя
     :param current_user: Объект записи текущего аутентифицированного пользователя из DB
-    :return: Словарь с данными пользователя
+    :param manager: Объект подключения к db
+    :return: Объект пользователя, сериализуемый по модели UserOut
     """
     try:
-        user_data = {
-            field: str(value) for field, value in current_user.__dict__.items() if type(value) in [str, int, uuid.UUID]
-        }
+        user = await manager.get(UserDB, [UserDB.user_id == current_user.user_id])
     except Exception as error:
         logger.error(
-            f'Во время работы "get_user" произошла ошибка: {error}. Данные запроса: {current_user.user_id}'
+            'Во время работы "get_user" произошла ошибка: %s. Данные запроса: %s', error, current_user.user_id
         )
-        return JSONResponse({'error': str(error)} if DEBUG else None, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    return JSONResponse(user_data, status_code=status.HTTP_200_OK)
+        return ORJSONResponse({'error': str(error)} if DEBUG else None, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return user
 
 
 @app.put(f'{DEFAULT_PATH}users/')
@@ -233,14 +343,18 @@ async def update_user(user: BaseUser, current_user=Depends(authenticate), manage
     :return: Словарь с данными пользователя
     """
     try:
-        data = serializer_tool.items_attr(user.model_fields_set, user)
-        manager.update(UserDB, str(current_user.user_id), current_user.user_id, data)
+        data = items_attr(user.model_fields_set, user)
+        data['password'] = await UserManager.hash_password(data['password'])
+        await manager.update(UserDB, current_user.user_id, UserDB.user_id, data)
+        UserManager.forget(current_user.username)
+        UserManager.forget(user.username)
+        del data['password']
     except Exception as error:
         logger.error(
-            f'Во время работы "update_user" произошла ошибка: {error}. Данные запроса: {current_user.user_id}'
+            'Во время работы "update_user" произошла ошибка: %s. Данные запроса: %s', error, current_user.user_id
         )
-        return JSONResponse({'error': str(error)} if DEBUG else None, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    return JSONResponse(data, status_code=status.HTTP_200_OK)
+        return ORJSONResponse({'error': str(error)} if DEBUG else None, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return ORJSONResponse(data, status_code=status.HTTP_200_OK)
 
 
 @app.post(f'{DEFAULT_PATH}users/')
@@ -252,62 +366,44 @@ async def create_user(user: UserRequest, manager=Depends(get_manager)):
     :return: Словарь с данными пользователя
     """
     try:
-        data = serializer_tool.items_attr(user.model_fields_set, user)
-        user = manager.create(UserDB, data)
-        data.update({'pk': str(user.user_id)})
+        data = items_attr(user.model_fields_set, user)
+        data['password'] = await UserManager.hash_password(data['password'])
+        user = await manager.create(UserDB, data)
+        UserManager.forget(user.username)
+        data.update({'pk': user.user_id})
         del data['password']
     except Exception as error:
-        logger.error(f'Во время работы "create_user" произошла ошибка: {error}.')
-        return JSONResponse({'error': str(error)} if DEBUG else None, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    return JSONResponse(data, status_code=status.HTTP_201_CREATED)
-
+        logger.error('Во время работы "create_user" произошла ошибка: %s.', error)
+        return ORJSONResponse({'error': str(error)} if DEBUG else None, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return ORJSONResponse(data, status_code=status.HTTP_201_CREATED)
 
-# ------------------------------------ Асинхронное выполнение задач на "сервере" ---------------------------------------
-def simulation_long_process(record_id: Base):
-    """
-    Симулирует выполнение длительной задачи. Ход выполнения отмечается в статусе объекта, над которым выполняется задача
-    :param record_id: Идентификатор отчёта
-    """
-    manager = Manager(Session())
-    record = manager.get(ReportDB, [ReportDB.report_id == record_id])
-    try:
-        data = {'status': record.status}
-        if record:
-            sleep(random.randint(2, 5))
-            data['status'] = ReportStatus.RUNNING
-            record = manager.save(record, data)
-            sleep(random.randint(5, 10))
-            failed_status_value = random.randint(0, 10)
-            data['status'] = ReportStatus.COMPLETED
-            if failed_status_value in [1, 3, 5]:
-                data['status'] = ReportStatus.FAILED
-            manager.save(record, data)
-    except Exception as error:
-        logger.error(f'Во время симуляции длительной задачи произошла неизвестная ошибка: {error}')
-    finally:
-        manager.close()
 
+# ------------------------------------ Эндпоинты взаимодействия с отчётами ---------------------------------------------
 @app.post(f'{DEFAULT_PATH}reports/')
-async def create_report(report: ReportCreate, background_tasks: BackgroundTasks, current_user=Depends(authenticate),
-        manager=Depends(get_manager)):
+async def create_report(report: ReportCreate, request: Request, background_tasks: BackgroundTasks,
+        current_user=Depends(authenticate), manager=Depends(get_manager)):
     """
     Функция для получения данных для создания отчёта. Основные параметры - start_date и stop_date
     :param report: Данные для создания отчёта
-    :param background_tasks: Менеджер фоновых задач для запуска обработки отчёта.
+    :param request: Объект запроса, через который доступно подключение к очереди задач
+    :param background_tasks: Менеджер фоновых задач для запуска обработки отчёта, если очередь задач не настроена
     :param current_user: Объект записи текущего аутентифицированного пользователя из DB
     :param manager: Объект подключения к db
     :return: Response 200 с id и статусом отчёта или Response 500 в случае ошибок
     """
     try:
-        data = serializer_tool.items_attr(report.model_fields_set, report)
+        data = items_attr(report.model_fields_set, report)
         data |= {'user_id': current_user.user_id, 'name': report.name}
-        report = manager.create(ReportDB, data)
-        background_tasks.add_task(simulation_long_process, report.report_id)
-        data = serializer_tool.items_str({'report_id': report.report_id, 'status': report.status.value})
+        report = await manager.create(ReportDB, data)
+        if request.app.state.arq is not None:
+            await request.app.state.arq.enqueue_job('simulation_long_process_job', report.report_id)
+        else:
+            background_tasks.add_task(simulation_long_process, report.report_id)
+        data = {'report_id': report.report_id, 'status': report.status.value}
     except Exception as error:
-        logger.error(f'Во время создания отчёта произошла неизвестная ошибка {error}')
-        return JSONResponse({'error': str(error)} if DEBUG else None, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    return JSONResponse(data, status_code=status.HTTP_201_CREATED)
+        logger.error('Во время создания отчёта произошла неизвестная ошибка %s', error)
+        return ORJSONResponse({'error': str(error)} if DEBUG else None, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return ORJSONResponse(data, status_code=status.HTTP_201_CREATED)
 
 
 @app.get(f"{DEFAULT_PATH}reports/" + '{report_id}/')
@@ -321,16 +417,16 @@ async def check_report(report_id: uuid.UUID, current_user=Depends(authenticate),
     :return: Идентификатор задачи и её текущий статус
     """
     try:
-        report = manager.get(ReportDB, [
-            ReportDB.report_id == report_id, ReportDB.user_id == current_user.user_id
-        ])
+        report = await manager.get_owned(ReportDB, ReportDB.report_id, ReportDB.user_id, report_id, current_user.user_id)
+        if not report:
+            return Response(status_code=status.HTTP_404_NOT_FOUND)
     except Exception as error:
-        logger.error(f'Во время получения данных о задаче {report_id} произошла неизвестная ошибка {error}')
-        return JSONResponse({'error': str(error)} if DEBUG else None, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    return JSONResponse(
-        {"report_id": str(report.report_id), 'status': report.status.value}, status_code=status.HTTP_200_OK
+        logger.error('Во время получения данных о задаче %s произошла неизвестная ошибка %s', report_id, error)
+        return ORJSONResponse({'error': str(error)} if DEBUG else None, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return ORJSONResponse(
+        {"report_id": report.report_id, 'status': report.status.value}, status_code=status.HTTP_200_OK
     )
 
 
 if __name__ == '__main__':
-    uvicorn.run('main:app', host='0.0.0.0', port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run('api.main:app', host='0.0.0.0', port=8000, loop='uvloop', http='httptools', reload=False)
\ No newline at end of file
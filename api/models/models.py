@@ -1,28 +1,17 @@
 import enum
 import inspect
 import uuid
-from datetime import datetime
+from datetime import datetime, date
 
 from pydantic import BaseModel, Field, model_validator, EmailStr
 
-from sqlalchemy import Column, String, UUID, DATE, Boolean, ForeignKey, create_engine, Enum
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker, validates
+from sqlalchemy import Column, String, UUID, DATE, Boolean, ForeignKey, Enum, Index, make_url, event, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.orm import declarative_base, relationship, validates
 
-from api.tools.password_tools import PasswordValidatorController, PasswordHashController
-
-
-def transform_date(date: str) -> datetime.date:
-    """
-    Преобразует полученный строковый формат полей даты к объекту date.
-    Проверяет, не превышает ли дата начала дату окончания
-    При фактическом завершении задачи позже установленного срока, автоматически устанавливает статус просрочки.
-    :param date: Строка времени
-    :return: Объект времени
-    """
-    try:
-        return datetime.date(*[int(obj) for obj in date.split("-")])
-    except ValueError:
-        raise ValueError(f"Ошибка формата даты. Ожидается ГГГГ-ММ-ДД. Получено: {date}")
+from api.config import DATABASE_URL, DATABASE_POOL, SQLITE_PRAGMAS
+from api.tools.password_tools import PasswordValidatorController
 
 
 # ------------------------------------------------ Модели Pydantic -----------------------------------------------------
@@ -42,16 +31,16 @@ class BaseTask(BaseModel):
         description='Описание задачи',
         max_length=512
     )
-    start_date: datetime = Field(
-        default_factory=datetime.today,
+    start_date: date = Field(
+        default_factory=date.today,
         title='Дата начала задачи',
         description='Дата начала задачи',
     )
-    stop_date: datetime = Field(
+    stop_date: date = Field(
         title='Дата окончания задачи',
         description='Дата окончания задачи'
     )
-    finish_date: datetime = Field(
+    finish_date: date = Field(
         default=None,
         title='Фактическая дата завершения',
         description='Фактическая дата завершения задачи',
@@ -78,15 +67,15 @@ class BaseRequiredTask(BaseTask):
         description='Описание задачи',
         max_length=512
     )
-    start_date: datetime = Field(
+    start_date: date = Field(
         title='Дата начала задачи',
         description='Дата начала задачи',
     )
-    stop_date: datetime = Field(
+    stop_date: date = Field(
         title='Дата окончания задачи',
         description='Дата окончания задачи'
     )
-    finish_date: datetime = Field(
+    finish_date: date = Field(
         title='Фактическая дата завершения',
         description='Фактическая дата завершения задачи',
     )
@@ -103,17 +92,12 @@ class TaskInput(BaseTask):
     @model_validator(mode='after')
     def date_fields_validator(self):
         """
-        Преобразует полученные строковые значения временных полей в объекты даты.
+        Проверяет, не превышает ли дата начала дату окончания.
+        При фактическом завершении задачи позже установленного срока, автоматически устанавливает статус просрочки.
         :return: Объект модели
         """
-        if isinstance(self.stop_date, str):
-            self.stop_date = transform_date(self.stop_date)
-        if isinstance(self.start_date, str):
-            self.start_date = transform_date(self.start_date)
         if self.stop_date < self.start_date:
             raise ValueError(f"stop_date '{self.stop_date}' не может быть меньше start_date '{self.start_date}'!")
-        if self.finish_date and isinstance(self.finish_date, str):
-            self.finish_date = transform_date(self.finish_date)
         if self.finish_date and self.finish_date > self.stop_date:
             self.expired = True
         return self
@@ -151,6 +135,24 @@ class TaskRequest(TaskCreate):
         extra = "forbid"
 
 
+class TaskOut(BaseModel):
+    """
+    Модель данных задачи для ответа. Заполняется напрямую из атрибутов объекта записи db
+    """
+    task_id: uuid.UUID = Field(title='Идентификатор', description='Идентификатор задачи')
+    name: str = Field(title='Название', description='Название задачи')
+    description: str | None = Field(title='Описание', description='Описание задачи')
+    start_date: date = Field(title='Дата начала задачи', description='Дата начала задачи')
+    stop_date: date = Field(title='Дата окончания задачи', description='Дата окончания задачи')
+    expired: bool = Field(
+        title='Статус несвоевременного выполнения задачи',
+        description='Статус несвоевременного выполнения задачи',
+    )
+
+    class Config:
+        from_attributes = True
+
+
 class BaseUser(BaseModel):
     """
     Модель данных пользователя. Все поля по умолчанию обязательны к заполнению
@@ -168,13 +170,25 @@ class BaseUser(BaseModel):
         )
         if isinstance(validate_result, str):
             raise ValueError(validate_result)
-        password_controller = PasswordHashController()
-        self.password = password_controller.hash_password(self.password)
         return self
 
     class Config:
         extra = "forbid"
 
+
+class UserOut(BaseModel):
+    """
+    Модель данных пользователя для ответа. Содержит только публичные поля и заполняется из атрибутов объекта записи db
+    """
+    user_id: uuid.UUID = Field(description='Идентификатор пользователя')
+    username: str = Field(description='Логин пользователя')
+    name: str | None = Field(description='Имя пользователя')
+    email: str | None = Field(description='Почта пользователя')
+
+    class Config:
+        from_attributes = True
+
+
 class UserRequest(BaseUser):
     """
     Модель данных для создания пользователя
@@ -198,11 +212,11 @@ class ReportCreate(BaseModel):
         default_factory=generate_report_name,
         description='Имя отчёта',
     )
-    start_date: datetime = Field(
+    start_date: date = Field(
         title='Дата начала периода формирования отчёта',
         description='Дата начала периода формирования отчёта',
     )
-    stop_date: datetime = Field(
+    stop_date: date = Field(
         title='Дата окончания периода формирования отчёта',
         description='Дата окончания периода формирования отчёта',
     )
@@ -210,13 +224,9 @@ class ReportCreate(BaseModel):
     @model_validator(mode='after')
     def date_fields_validator(self):
         """
-        Преобразует полученные строковые значения временных полей в объекты даты.
+        Проверяет, не превышает ли дата начала периода дату его окончания.
         :return: Объект модели
         """
-        if isinstance(self.stop_date, str):
-            self.stop_date = transform_date(self.stop_date)
-        if isinstance(self.start_date, str):
-            self.start_date = transform_date(self.start_date)
         if self.stop_date < self.start_date:
             raise ValueError(f"stop_date '{self.stop_date}' не может быть меньше start_date '{self.start_date}'!")
         return self
@@ -226,31 +236,36 @@ class ReportCreate(BaseModel):
 
 
 # ------------------------------------------------ Модели SQL Alchemy и настройки к ним --------------------------------
+# Неявная подгрузка связей запрещена (lazy='raise'): нужные связи подгружаются явно через options запроса,
+# например Manager.filter(TaskDB, filters, options=[selectinload(TaskDB.user)])
 Base = declarative_base()
 
 
 class TaskDB(Base):
     __tablename__ = 'tasks'
-    task_id: uuid.UUID = Column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid.uuid4)
+    task_id: uuid.UUID = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name: str = Column(String, nullable=True)
     description: str = Column(String, nullable=True)
-    start_date: datetime.date = Column(DATE, nullable=False, default=datetime.today)
-    stop_date: datetime.date = Column(DATE, nullable=False)
-    finish_date: datetime.date = Column(DATE, nullable=True, default=None)
+    start_date: date = Column(DATE, nullable=False, default=date.today)
+    stop_date: date = Column(DATE, nullable=False)
+    finish_date: date = Column(DATE, nullable=True, default=None)
     expired: bool = Column(Boolean, default=False)
     user_id: uuid.UUID = Column(UUID(as_uuid=True), ForeignKey("users.user_id"), nullable=False)
-    user = relationship("UserDB", back_populates='tasks')
+    user = relationship("UserDB", back_populates='tasks', lazy='raise')
+
+    # Составной индекс под выборки задач пользователя и задачи по её идентификатору в пределах задач пользователя
+    __table_args__ = (Index('ix_task_user_task', 'user_id', 'task_id'),)
 
 
 class UserDB(Base):
     __tablename__ = 'users'
-    user_id: uuid.UUID = Column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid.uuid4)
+    user_id: uuid.UUID = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     username: str = Column(String, unique=True, nullable=False, index=True)
     password: str = Column(String, nullable=False)
     name: str = Column(String, nullable=True)
     email: str = Column(String, nullable=True)
-    tasks = relationship('TaskDB', back_populates='user')
-    reports = relationship('ReportDB', back_populates='user')
+    tasks = relationship('TaskDB', back_populates='user', lazy='raise')
+    reports = relationship('ReportDB', back_populates='user', lazy='raise')
 
 
 class ReportStatus(enum.Enum):
@@ -262,15 +277,54 @@ class ReportStatus(enum.Enum):
 
 class ReportDB(Base):
     __tablename__ = 'reports'
-    report_id: uuid.UUID = Column(UUID(as_uuid=True), primary_key=True, index=True, default=uuid.uuid4)
+    report_id: uuid.UUID = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name: str = Column(String, nullable=False)
-    start_date: datetime.date = Column(DATE, default=datetime.today, nullable=False)
-    stop_date: datetime.date = Column(DATE, nullable=False)
+    start_date: date = Column(DATE, default=date.today, nullable=False)
+    stop_date: date = Column(DATE, nullable=False)
     user_id: uuid.UUID = Column(UUID(as_uuid=True), ForeignKey("users.user_id"), nullable=False)
-    user = relationship("UserDB", back_populates='reports')
+    user = relationship("UserDB", back_populates='reports', lazy='raise')
     status = Column(Enum(ReportStatus), nullable=False, default=ReportStatus.CREATED)
 
+    # Составной индекс под выборки отчёта по его идентификатору в пределах отчётов пользователя
+    __table_args__ = (Index('ix_report_user_report', 'user_id', 'report_id'),)
+
 
-engine = create_engine('sqlite:///db/api_tasks.db', connect_args={"check_same_thread": False})
-Base.metadata.create_all(engine)
-Session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
\ No newline at end of file
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Устанавливает параметры SQLite из настроек SQLITE_PRAGMAS для каждого нового соединения
+    :param dbapi_connection: Соединение драйвера базы данных
+    :param connection_record: Запись пула о соединении
+    """
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {pragma} = {value}')
+    cursor.close()
+
+
+database_url = make_url(DATABASE_URL)
+engine_options = {}
+if database_url.get_backend_name() == 'sqlite':
+    # Драйвер aiosqlite по умолчанию не использует пул, поэтому пул соединений задаётся явно
+    engine_options['poolclass'] = AsyncAdaptedQueuePool
+engine = create_async_engine(
+    database_url,
+    query_cache_size=1200,  # Размер кэша скомпилированных SQL выражений
+    insertmanyvalues_page_size=1000,  # Количество строк в одном пакетном INSERT
+    **DATABASE_POOL,
+    **engine_options,
+)
+if database_url.get_backend_name() == 'sqlite':
+    event.listen(engine.sync_engine, 'connect', set_sqlite_pragmas)
+# Объекты не сбрасываются после commit: их атрибуты доступны без повторной выборки из базы
+Session = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+
+async def init_models():
+    """
+    Создаёт таблицы базы данных, если они ещё не созданы. Вызывается при запуске приложения.
+    Для SQLite дополнительно обновляется статистика, используемая планировщиком запросов при выборе индексов
+    """
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        if engine.dialect.name == 'sqlite':
+            await connection.execute(text('PRAGMA optimize'))
@@ -1,48 +1,56 @@
-from api.models.models import Base
+from operator import attrgetter
 
+from pydantic import BaseModel
 
-class ApiSerializers:
+from api.models.models import Base, TaskOut
+
+
+# Поля задачи в ответе и функция получения их значений у объекта записи одним вызовом
+TASK_FIELDS = tuple(TaskOut.model_fields)
+_task_getter = attrgetter(*TASK_FIELDS)
+
+
+def serialize_task(task: Base) -> dict:
     """
-    Набор инструментов для преобразования данных
+    Преобразует задачу из объекта в словарь с данными её полей. Значения не приводятся к строкам,
+    их сериализует orjson
+    :param task: Объект задачи
+    :return: Словарь с данными задачи
     """
+    return dict(zip(TASK_FIELDS, _task_getter(task)))
+
 
-    @staticmethod
-    def serialize_task(task: Base) -> dict:
-        """
-        Преобразует задачу из объекта в словарь с данными её полей
-        :param task: Объект задачи
-        :return: Словарь с данными задачи
-        """
-        return {'name': task.name,
-                'description': task.description,
-                'start_date': str(task.start_date),
-                'stop_date': str(task.stop_date),
-                'expired': str(task.expired),
-                'task_id': str(task.task_id)}
-
-    @staticmethod
-    def items_str(data: dict) -> dict:
-        """
-        Преобразует все значения входящего словаря в строки
-        :param data: Словарь с данными
-        :return: Преобразованный словарь с данными
-        """
-        return {str(field): str(value) for field, value in data.items()}
-
-    @staticmethod
-    def items_attr(data: list | set, obj: Base) -> dict:
-        """
-        На основе списка полей data получает одноимённые атрибуты у obj и формирует словарь
-        :param data: Список полей
-        :param obj: Объект
-        :return: Словарь с данными объекта
-        """
-        return {field: getattr(obj, field) for field in data}
-
-    def serialize_tasks(self, tasks: list) -> list[dict]:
-        """
-        Преобразует список из объектов задач в список словарей данными их полей
-        :param tasks: Список объектов задач
-        :return: Список словарей с данными
-        """
-        return [self.serialize_task(obj) for obj in tasks]
+def items_attr(data: list | set, obj: BaseModel) -> dict:
+    """
+    На основе списка полей data получает одноимённые атрибуты у obj и формирует словарь.
+    Словарь собирается сериализатором pydantic за один вызов
+    :param data: Список полей
+    :param obj: Объект модели pydantic
+    :return: Словарь с данными объекта
+    """
+    return obj.model_dump(include=set(data))
+
+
+def accepts_media_type(accept: str, media_type: str) -> bool:
+    """
+    Проверяет, запрошен ли клиентом тип содержимого в заголовке Accept. Заголовок разбирается на диапазоны типов,
+    тип должен быть указан явно (без масок вида */*), диапазоны с q=0 считаются неприемлемыми
+    :param accept: Значение заголовка Accept
+    :param media_type: Тип содержимого, например application/x-ndjson
+    :return: True, если тип указан в заголовке с ненулевым весом q, иначе False
+    """
+    for media_range in accept.split(','):
+        name, *params = media_range.split(';')
+        if name.strip().lower() != media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            return True
+    return False
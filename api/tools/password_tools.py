@@ -1,17 +1,50 @@
 """
 Набор инструментов, связанных с логикой валидации и обработки пароля
 """
-import os
-from collections import namedtuple
-from typing import Optional
+import logging
+from functools import lru_cache, partial
+from importlib import import_module
+from time import perf_counter
+from typing import Optional, TYPE_CHECKING
+
+from rapidfuzz import process
+from rapidfuzz.distance import Indel
+from api.config import PASSWORD_VALIDATORS, HASH_PASSWORD_ALGORITHM, HASH_PASSWORD_SETTINGS
+from api.tools.validators import AbstractValidator
 
-import importlib.util
+logger = logging.getLogger(__name__)
 
-import Levenshtein
-from api.config import PASSWORD_VALIDATORS, BASE_DIR, HASH_PASSWORD_ALGORITHM
-from passlib.context import CryptContext
-from password_strength import PasswordPolicy
-from api.tools.validators import AbstractValidator
+# passlib и password_strength импортируются при первом создании контекста хеширования или политики сложности,
+# процессы, не работающие с паролями (например, воркер arq), не тратят время на их загрузку
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+    from password_strength import PasswordPolicy
+
+
+# Допуск нижней границы схожести, передаваемой в rapidfuzz. Отсечение внутри rapidfuzz выполняется по расстоянию
+# и на границе может расходиться со строгим сравнением схожести с коэффициентом, поэтому граница немного занижается
+SIMILARITY_CUTOFF_TOLERANCE = 1e-6
+
+# Параметр стоимости алгоритмов хеширования, стоимость которых подбирается под целевое время
+HASH_COST_PARAMETERS = {
+    'argon2': 'time_cost',
+    'bcrypt': 'rounds',
+}
+
+
+@lru_cache(maxsize=32)
+def _policy(uppercase: int, numbers: int, special: int) -> 'PasswordPolicy':
+    """
+    Возвращает политику сложности пароля для заданных требований.
+    Политика создаётся один раз для каждого набора требований и используется повторно при следующих проверках.
+    :param uppercase: Минимальное количество заглавных букв
+    :param numbers: Минимальное количество цифр
+    :param special: Минимальное количество специальных символов
+    :return: Объект политики сложности пароля
+    """
+    from password_strength import PasswordPolicy
+
+    return PasswordPolicy.from_names(uppercase=uppercase, numbers=numbers, special=special)
 
 
 class LevenshteinPasswordValidator(AbstractValidator):
@@ -21,18 +54,24 @@ class LevenshteinPasswordValidator(AbstractValidator):
     то валидация считается неудачной, и выбрасывается исключение.
     """
 
-    def _validate(self, **kwargs) -> None:
+    @classmethod
+    def _validate(cls, **kwargs) -> None:
         """
         Выполняет проверку пароля на схожесть с другими значениями, используя алгоритм Левенштейна.
         Метод вычисляет коэффициент схожести между переданным паролем и значениями из других полей.
         Если схожесть между паролем и любым из значений превышает заданный коэффициент,
         выбрасывается исключение с указанием поля, с которым пароли слишком схожи.
+        Пароль подготавливается для сравнения один раз, значения сравниваются с ним в одном вызове rapidfuzz.
+        Значения, схожесть с которыми заведомо ниже коэффициента, отсекаются rapidfuzz без полного расчёта расстояния.
         """
         password = kwargs.pop('password')
-        coefficient = kwargs.get('coefficient', 0.7)
-        other_fields = kwargs
-        for field, value in other_fields.items():
-            similarity = Levenshtein.ratio(password, value)
+        coefficient = kwargs.pop('coefficient', 0.7)
+        kwargs.pop('raise_exception', None)
+        other_fields = {field: str(value) for field, value in kwargs.items()}
+        score_cutoff = min(max(coefficient - SIMILARITY_CUTOFF_TOLERANCE, 0.0), 1.0)
+        for _, similarity, field in process.extract_iter(
+            password, other_fields, scorer=Indel.normalized_similarity, score_cutoff=score_cutoff
+        ):
             if similarity > coefficient:
                 raise ValueError(f"Значение пароля слишком похоже на значение {field}")
 
@@ -42,70 +81,92 @@ class StrengthPasswordValidator(AbstractValidator):
     Валидатор сложности пароля. Проваливает валидацию
     """
 
-    def _validate(self, **kwargs) -> None:
-        password = kwargs.get('password')
-        policy = PasswordPolicy.from_names(
-            uppercase=kwargs.get('uppercase', 1), numbers=kwargs.get('numbers', 0), special=kwargs.get('special', 0)
-        )
-        if policy.test(password):
+    @classmethod
+    def _validate(cls, **kwargs) -> None:
+        get = kwargs.get
+        policy = _policy(get('uppercase', 1), get('numbers', 0), get('special', 0))
+        if policy.test(get('password')):
             raise ValueError("Введённый пароль слишком слабый!")
 
 
+def _load_validators() -> tuple[partial, ...]:
+    """
+    Собирает из переменной конфигурации список валидаторов пароля и конфигурации к ним.
+    Валидация основана на словаре `PASSWORD_VALIDATORS`, где ключи — это строки с полными путями до
+    классов валидаторов, а значения — это конфигурации для каждого валидатора.
+    Эта функция динамически загружает указанные в конфигурации классы валидаторов, импортируя их модули
+    по полному пути, и возвращает кортеж валидаторов с уже привязанной к ним конфигурацией.
+    Валидаторы запускаются методами класса, без создания экземпляров. Если в конфигурации валидатора
+    выбрасывание исключения не отключено, используется непосредственно _validate: исключение перехватывает validate.
+    Иначе используется _run_validate, подавляющий ошибку валидации.
+    :raises ImportError: Модуль валидатора не найден.
+    :raises AttributeError: Класс валидатора не найден в модуле.
+    :return: Кортеж объектов partial, где каждый объект — метод валидатора с параметрами из конфигурации
+             (например, (partial(ValidatorClass._validate, param=value),))
+    """
+    if not PASSWORD_VALIDATORS or not isinstance(PASSWORD_VALIDATORS, dict):
+        return ()
+    validators = []
+    for validator_str, params in PASSWORD_VALIDATORS.items():
+        module_name, _, validator_class_name = validator_str.rpartition('.')
+        # Отсутствующий модуль или класс валидатора приводит к ImportError или AttributeError при запуске приложения,
+        # а не к молчаливому отключению проверки пароля
+        validator_class = getattr(import_module(module_name), validator_class_name)
+        params = params or {}
+        if params.get('raise_exception', True) is False:
+            validators.append(partial(validator_class._run_validate, **params))
+        else:
+            validators.append(partial(validator_class._validate, **params))
+    return tuple(validators)
+
+
+def refresh_validators() -> None:
+    """
+    Загружает валидаторы пароля из PASSWORD_VALIDATORS. Вызывается при импорте модуля,
+    повторный вызов нужен только после изменения PASSWORD_VALIDATORS во время работы, например в тестах.
+    """
+    global _VALIDATORS
+    _VALIDATORS = _load_validators()
+
+
 class PasswordValidatorController:
     """
     Контроллер для управления процессом валидации пароля с использованием нескольких валидаторов,
-    заданных в конфигурации проекта. Класс предоставляет механизм для динамической загрузки валидаторов
-    и их конфигурации из файла настроек, что позволяет легко расширять систему валидации.
+    заданных в конфигурации проекта. Валидаторы и их конфигурация загружаются из файла настроек
+    один раз при импорте модуля, что позволяет легко расширять систему валидации.
     """
 
-    @staticmethod
-    def __get_validators() -> Optional[list[Optional[tuple]]]:
-        """
-        Собирает из переменной конфигурации список валидаторов пароля и конфигурации к ним.
-        Валидация основана на словаре `PASSWORD_VALIDATORS`, где ключи — это строки с полными путями до
-        классов валидаторов, а значения — это конфигурации для каждого валидатора.
-        Этот метод динамически загружает указанные в конфигурации классы валидаторов, импортируя их из файлов по пути,
-        указанному в конфигурации, и возвращает список кортежей из объектов валидаторов и их конфигураций.
-        :return: Список кортежей, где каждый кортеж состоит из объекта валидатора и его конфигурации
-                 (например, [('ValidatorClass', {'param': value})])
-        """
-        if not PASSWORD_VALIDATORS or not isinstance(PASSWORD_VALIDATORS, dict):
-            return []
-        validators = []
-        for validator_str, params in PASSWORD_VALIDATORS.items():
-            try:
-                module_name, validator_class_name = validator_str.rsplit('.', 1)
-                module_name = module_name.split('.')
-                file_path = os.path.join(BASE_DIR, *module_name) + '.py'
-                if not os.path.isfile(file_path):
-                    raise FileNotFoundError(f"Не удалось найти файл: {file_path}")
-                module_name = module_name[1]
-                specification = importlib.util.spec_from_file_location(module_name, file_path)
-                module = importlib.util.module_from_spec(specification)
-                specification.loader.exec_module(module)
-                if hasattr(module, validator_class_name):
-                    Validator = namedtuple('Validator', 'obj config')
-                    validators.append(Validator(obj=getattr(module, validator_class_name), config=params))
-            except (FileNotFoundError, AttributeError, TypeError) as error:
-                raise error
-        return validators
-
     def validate(self, **kwargs) -> bool | str:
         """
-        Собирает валидаторы, заданные в настройках проекта, и запускает валидацию пароля.
+        Запускает валидацию пароля валидаторами, заданными в настройках проекта.
         В случае успеха возвращает True. В случае ошибки — строку с описанием ошибки.
+        Выбрасывание исключения валидатором (raise_exception) задаётся в его конфигурации в PASSWORD_VALIDATORS.
         :param kwargs: Входные данные для валидаторов, например, пароль и дополнительные параметры для валидации.
         :return: Строка с ошибкой в случае неудачной валидации, или True в случае успешной валидации.
         """
-        validators = self.__get_validators()
         try:
-            # Для каждого валидатора из списка создаем экземпляр и запускаем валидацию
-            [validator.obj(**{**validator.config, **kwargs}) for validator in validators]
+            # Для каждого валидатора из списка запускаем валидацию.
+            # Переданные параметры дополняют конфигурацию валидатора и имеют приоритет над ней
+            for validator in _VALIDATORS:
+                validator(**kwargs)
         except Exception as error:
             return str(error)
         return True
 
 
+@lru_cache(maxsize=4)
+def _crypt_context(schemes: str) -> 'CryptContext':
+    """
+    Возвращает контекст хеширования паролей для заданных алгоритмов.
+    Контекст создаётся один раз для каждого набора алгоритмов и разделяется всеми экземплярами контроллера.
+    :param schemes: Алгоритмы хеширования через запятую, первый из них используется для новых хешей
+    :return: Объект контекста хеширования passlib
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=schemes, deprecated="auto", **HASH_PASSWORD_SETTINGS)
+
+
 class PasswordHashController:
     """
     Контроллер для работы с хешированием паролей. Обеспечивает создание хешей паролей с использованием
@@ -113,7 +174,7 @@ class PasswordHashController:
     """
 
     def __init__(self, schemes: str  = HASH_PASSWORD_ALGORITHM):
-        self.crypt_context = CryptContext(schemes=schemes, deprecated="auto")
+        self.crypt_context = _crypt_context(schemes)
 
     def hash_password(self, password: str) -> str:
         """
@@ -130,4 +191,55 @@ class PasswordHashController:
         :param hashed_password: Хеш пароля, с которым необходимо сравнить.
         :return: `True`, если пароль соответствует хешу, иначе `False`.
         """
-        return self.crypt_context.verify(password, hashed_password)
\ No newline at end of file
+        return self.crypt_context.verify(password, hashed_password)
+
+    def needs_update(self, hashed_password) -> bool:
+        """
+        Проверяет, нужно ли пересчитать хеш пароля: хеш создан устаревшим алгоритмом или с другими параметрами.
+        :param hashed_password: Хеш пароля.
+        :return: `True`, если хеш необходимо пересчитать, иначе `False`.
+        """
+        return self.crypt_context.needs_update(hashed_password)
+
+
+def calibrate_hash_cost(target_time: float, schemes: str = HASH_PASSWORD_ALGORITHM) -> Optional[int]:
+    """
+    Подбирает стоимость основного алгоритма хеширования под целевое время на текущем оборудовании.
+    Стоимость увеличивается, пока время хеширования не превысит целевое. Выбирается наибольшая стоимость,
+    укладывающаяся в целевое время. Стоимость никогда не опускается ниже заданной в HASH_PASSWORD_SETTINGS
+    (или значения passlib по умолчанию): если целевое время недостижимо даже с ней, она сохраняется
+    и в журнал записывается предупреждение.
+    Выбранное значение записывается в HASH_PASSWORD_SETTINGS, созданные ранее контексты хеширования сбрасываются.
+    :param target_time: Целевое время вычисления одного хеша в секундах
+    :param schemes: Алгоритмы хеширования через запятую, подбирается стоимость первого из них
+    :return: Выбранная стоимость или None, если для алгоритма подбор не поддерживается
+    """
+    scheme = schemes.split(',', 1)[0].strip()
+    if scheme not in HASH_COST_PARAMETERS:
+        return None
+    parameter = HASH_COST_PARAMETERS[scheme]
+    handler = _crypt_context(schemes).handler(scheme)
+    # Настроенная стоимость — нижняя граница подбора: калибровка может только усилить хеширование
+    cost = selected = handler.default_rounds
+    while cost <= handler.max_rounds:
+        started = perf_counter()
+        handler.using(**{parameter: cost}).hash('calibration')
+        elapsed = perf_counter() - started
+        if elapsed > target_time:
+            if cost == selected:
+                logger.warning(
+                    'Хеширование %s со стоимостью %s занимает %.3f с и превышает целевое время %s с, '
+                    'стоимость не снижается ниже настроенной', scheme, cost, elapsed, target_time
+                )
+            break
+        selected = cost
+        cost += 1
+    HASH_PASSWORD_SETTINGS[f'{scheme}__{parameter}'] = selected
+    _crypt_context.cache_clear()
+    return selected
+
+
+# Валидаторы загружаются в конце модуля, когда определены все его классы, в том числе указанные в PASSWORD_VALIDATORS.
+# Ошибка в конфигурации валидаторов проявляется при запуске приложения, а не при первой проверке пароля
+_VALIDATORS: tuple[partial, ...] = ()
+refresh_validators()
@@ -1,6 +1,6 @@
 """
 Изначально планировался небольшой модуль нескольких валидаторов. В итоге здесь остался абстрактный класс для
-реализации валидаторов. Классы-наследники должны переопределить метод _validate для реализации своей логики валидации
+реализации валидаторов. Классы-наследники должны переопределить метод класса _validate для реализации своей логики валидации
 Этот класс предоставляет базовую функциональность для выполнения валидации, а также управления исключениями,
 которые могут возникать в процессе проверки.
 """
@@ -11,33 +11,35 @@ from typing import Optional
 class AbstractValidator:
     def __init__(self, **kwargs):
         """
+        Создание экземпляра запускает валидацию. Состояние в экземпляре не хранится, поэтому валидацию можно
+        запускать и без создания экземпляра, вызовом метода класса _run_validate с теми же параметрами.
         :param raise_exception: Статус, указывающий, выбрасывать исключение при провале валидации.
         """
-        raise_exception = kwargs.get('raise_exception', True)
-        if not isinstance(raise_exception, bool):
-            raise_exception = True
-        self.raise_exception = raise_exception
         self._run_validate(**kwargs)
 
-    def _run_validate(self, **kwargs) -> Optional[bool]:
+    @classmethod
+    def _run_validate(cls, **kwargs) -> Optional[bool]:
         """
         Обёртка для основного метода валидации, которая централизованно управляет логикой обработки ошибок
         и выбора действия в случае провала.
         При неудачной валидации метод либо выбрасывает исключение,
         либо возвращает False в зависимости от параметра raise_exception.
         :param kwargs: Атрибуты, необходимые для выполнения валидации в методах-потомках.
+        :param raise_exception: Статус, указывающий, выбрасывать исключение при провале валидации.
+                                Значение, отличное от bool, считается равным True.
         :return: True, если валидация прошла успешно, или False, если выбрасывание исключения не настроено.
         """
         try:
-            self._validate(**kwargs)
+            cls._validate(**kwargs)
         except Exception as error:
-            if self.raise_exception:
+            if kwargs.get('raise_exception', True) is not False:
                 raise error
             return False
         return True
 
+    @classmethod
     @abstractmethod
-    def _validate(self, **kwargs) -> None:
+    def _validate(cls, **kwargs) -> None:
         """
         Основной метод для реализации логики валидации, который должен быть переопределен в классе-наследнике.
         Этот метод выполняет собственную валидацию и выбрасывает исключение, если валидация не удалась.
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import random
+import uuid
+
+from arq.connections import RedisSettings
+
+from api.config import REDIS_URL
+from api.db.manager import Manager
+from api.models.models import ReportDB, ReportStatus, Session, engine
+
+
+logger = logging.getLogger(__name__)
+
+
+# ------------------------------------ Асинхронное выполнение задач на "сервере" ---------------------------------------
+async def set_report_status(record_id: uuid.UUID, report_status: ReportStatus) -> bool:
+    """
+    Обновляет статус отчёта в отдельной короткой сессии
+    :param record_id: Идентификатор отчёта
+    :param report_status: Новый статус отчёта
+    :return: True, если отчёт найден и обновлён
+    """
+    async with Session() as session:
+        return await Manager(session).update(ReportDB, record_id, ReportDB.report_id, {'status': report_status}) is not None
+
+
+async def simulation_long_process(record_id: uuid.UUID):
+    """
+    Симулирует выполнение длительной задачи. Ход выполнения отмечается в статусе объекта, над которым выполняется задача.
+    Ожидание выполняется в цикле событий и не занимает поток и соединение с db
+    :param record_id: Идентификатор отчёта
+    """
+    try:
+        await asyncio.sleep(random.randint(2, 5))
+        if not await set_report_status(record_id, ReportStatus.RUNNING):
+            return
+        await asyncio.sleep(random.randint(5, 10))
+        failed_status_value = random.randint(0, 10)
+        await set_report_status(
+            record_id, ReportStatus.FAILED if failed_status_value in [1, 3, 5] else ReportStatus.COMPLETED
+        )
+    except Exception as error:
+        logger.error('Во время симуляции длительной задачи произошла неизвестная ошибка: %s', error)
+
+
+async def simulation_long_process_job(ctx: dict, record_id: uuid.UUID):
+    """
+    Задача очереди arq для обработки отчёта в процессе воркера
+    :param ctx: Контекст воркера arq
+    :param record_id: Идентификатор отчёта
+    """
+    await simulation_long_process(record_id)
+
+
+async def shutdown(ctx: dict):
+    """
+    Закрывает соединения пула db воркера при его остановке
+    :param ctx: Контекст воркера arq
+    """
+    await engine.dispose()
+
+
+class WorkerSettings:
+    """
+    Настройки воркера arq. Запуск: arq api.workers.WorkerSettings
+    """
+    functions = [simulation_long_process_job]
+    on_shutdown = shutdown
+    redis_settings = RedisSettings.from_dsn(REDIS_URL) if REDIS_URL else RedisSettings()